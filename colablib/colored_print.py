@@ -1,3 +1,4 @@
+import sys
 import datetime
 import pytz
 
@@ -32,6 +33,48 @@ style_codes = {
     "strikethrough": "\033[9m",
 }
 
+_RESET = color_codes["default"]
+_prefix_cache = {}
+
+def _get_prefix(style, color, bg_color):
+    """
+    Returns the escape sequence for a style/color/background combination.
+
+    Arguments are validated the first time a combination is seen and the result is cached.
+    """
+    key = (style, color, bg_color)
+    prefix = _prefix_cache.get(key)
+    if prefix is not None:
+        return prefix
+
+    if color not in color_codes:
+        raise ValueError(f"Invalid color value '{color}'. Available options are: {', '.join(color_codes.keys())}")
+
+    if style not in style_codes:
+        raise ValueError(f"Invalid style value '{style}'. Available options are: {', '.join(style_codes.keys())}")
+
+    if bg_color and bg_color not in color_codes:
+        raise ValueError(f"Invalid background color value '{bg_color}'. Available options are: {', '.join(color_codes.keys())}")
+
+    prefix = style_codes[style] + color_codes[color]
+    if bg_color:
+        prefix += "\033[4" + color_codes[bg_color][3:]
+
+    _prefix_cache[key] = prefix
+    return prefix
+
+_tz_cache = {}
+
+def _get_tz(name):
+    """
+    Returns the pytz timezone for the given name, or UTC if no name is given. Results are cached.
+    """
+    tz = _tz_cache.get(name)
+    if tz is None:
+        tz = pytz.timezone(name or 'UTC')
+        _tz_cache[name] = tz
+    return tz
+
 def cprint(*args, color="default", style="normal", bg_color=None, reset=True, timestamp=False, line=None, tqdm_desc=False, timestamp_format='%Y-%m-%d %H:%M:%S', prefix=None, suffix=None, timezone=None):
     """
     Prints colored text in the console.
@@ -53,21 +96,12 @@ def cprint(*args, color="default", style="normal", bg_color=None, reset=True, ti
     Returns:
         None
     """
-    if color not in color_codes:
-        raise ValueError(f"Invalid color value '{color}'. Available options are: {', '.join(color_codes.keys())}")
-
-    if style not in style_codes:
-        raise ValueError(f"Invalid style value '{style}'. Available options are: {', '.join(style_codes.keys())}")
-
-    if bg_color and bg_color not in color_codes:
-        raise ValueError(f"Invalid background color value '{bg_color}'. Available options are: {', '.join(color_codes.keys())}")
-
-    color_start = style_codes[style] + color_codes[color]
-    if bg_color:
-        bg_color_code = "\033[4" + color_codes[bg_color][3:]
-        color_start += bg_color_code
-    color_end = color_codes["default"] if reset else ""
-    formatted_text = " ".join(str(arg) for arg in args)
+    color_start = _get_prefix(style, color, bg_color)
+    color_end = _RESET if reset else ""
+    if len(args) == 1:
+        formatted_text = args[0] if type(args[0]) is str else str(args[0])
+    else:
+        formatted_text = " ".join(map(str, args))
 
     if prefix:
         formatted_text = str(prefix) + formatted_text
@@ -76,7 +110,7 @@ def cprint(*args, color="default", style="normal", bg_color=None, reset=True, ti
         formatted_text = formatted_text + str(suffix)
 
     if timestamp:
-        now = datetime.datetime.now(pytz.timezone(timezone) if timezone else pytz.timezone('UTC'))
+        now = datetime.datetime.now(_get_tz(timezone))
         formatted_text = f"[{now.strftime(timestamp_format)}] {formatted_text}"
 
     if line:
@@ -85,7 +119,7 @@ def cprint(*args, color="default", style="normal", bg_color=None, reset=True, ti
     if tqdm_desc:
         return color_start + formatted_text
     else:
-        print(color_start + formatted_text + color_end)
+        sys.stdout.write(color_start + formatted_text + color_end + "\n")
 
 def print_line(length, color="default", style="normal", bg_color=None, reset=True):
     """
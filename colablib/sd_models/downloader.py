@@ -1,17 +1,50 @@
 import os
+import re
+import shutil
 import subprocess
-import glob
 import gdown
 import time
+import functools
+import contextlib
 # from mega import Mega
 from tqdm import tqdm
-from pathlib import Path
+from urllib.parse import urlparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from ..utils.py_utils import get_filename, calculate_elapsed_time
 from ..colored_print import cprint
 
 SUPPORTED_EXTENSIONS = (".ckpt", ".safetensors", ".pt", ".pth")
 
+_URL_KIND_RE = re.compile(r"(?P<gdrive>drive\.google\.com)|(?P<mydrive>drive/MyDrive)|(?P<hf>huggingface\.co)")
+
+@functools.lru_cache(maxsize=512)
+def _classify_url(url: str) -> str:
+    """
+    Classifies a URL as 'gdrive', 'mydrive', 'hf' or 'other' with a single regex scan.
+    """
+    match = _URL_KIND_RE.search(url)
+    return match.lastgroup if match else "other"
+
+_HF_REWRITE_RE = re.compile(r"/blob/|\?download=true$")
+_HF_REWRITES = {"/blob/": "/resolve/", "?download=true": ""}
+
+def _normalize_url(url: str) -> str:
+    """
+    Rewrites Hugging Face web URLs to their direct download form in a single pass.
+    """
+    if _classify_url(url) == "hf":
+        return _HF_REWRITE_RE.sub(lambda match: _HF_REWRITES[match.group(0)], url)
+    return url
+
+def _format_value_arg(k, v):
+    return f"--{k}={v}"
+
+# Formatters keyed on the exact value type; anything not listed is passed as --key=value.
+_ARG_FORMATTERS = {
+    bool        : lambda k, v: f"--{k}" if v else None,
+    type(None)  : lambda k, v: None,
+}
+
 def parse_args(config):
     """
     Converts a dictionary of arguments into a list for command line usage.
@@ -27,13 +60,24 @@ def parse_args(config):
     for k, v in config.items():
         if k.startswith("_"):
             args.append(str(v))
-        elif v is not None and not isinstance(v, bool):
-            args.append(f'--{k}={v}')
-        elif isinstance(v, bool) and v:
-            args.append(f"--{k}")
+            continue
+
+        arg = _ARG_FORMATTERS.get(type(v), _format_value_arg)(k, v)
+        if arg:
+            args.append(arg)
 
     return args
 
+# Options shared by every single-file aria2c download.
+_ARIA2_STATIC_ARGS = (
+    "--console-log-level=error",
+    "--summary-interval=10",
+    "--continue",
+    "--max-connection-per-server=16",
+    "--min-split-size=1M",
+    "--split=16",
+)
+
 def aria2_download(download_dir: str, filename: str , url: str, quiet: bool=False, user_header: str=None):
     """
     Downloads a file using the aria2 download manager.
@@ -48,24 +92,79 @@ def aria2_download(download_dir: str, filename: str , url: str, quiet: bool=Fals
         start_time = time.time()
         cprint(f"Starting download of '{filename}' with aria2c...", color="green")
 
+    aria2_args = [*_ARIA2_STATIC_ARGS, f"--dir={download_dir}"]
+    if filename:
+        aria2_args.append(f"--out={filename}")
+    if user_header and _classify_url(url) == "hf":
+        aria2_args.append(f"--header={user_header}")
+    aria2_args.append(url)
+
+    process = subprocess.Popen(["aria2c", *aria2_args], stdout=subprocess.DEVNULL if quiet else None)
+    process.wait()
+    
+    if not quiet:
+        elapsed_time = calculate_elapsed_time(start_time)
+        cprint(f"Download of '{filename}' completed. Took {elapsed_time}.", color="green")
+
+def aria2_batch_download(download_dir: str, entries: list, quiet: bool=False, user_header: str=None, callback=None):
+    """
+    Downloads several files with a single aria2c process.
+
+    The URLs are passed to aria2c as an input file on stdin, so one process schedules every
+    download and reuses its connections and DNS cache across files.
+
+    Args:
+        download_dir    (str)               : Directory to download the files to.
+        entries         (list)              : (url, filename) pairs. A filename of None lets aria2c name the file.
+        quiet           (bool, optional)    : If True, suppresses aria2c output. Defaults to False.
+        user_header     (str, optional)     : Optional header to use for Hugging Face requests. Defaults to None.
+        callback        (callable, optional): Called once per completed file. When set, aria2c output is
+                                              parsed instead of printed and only errors are shown. Defaults to None.
+
+    Returns:
+        int: The aria2c exit status.
+    """
+    input_lines = []
+    for url, filename in entries:
+        input_lines.append(url)
+        if filename:
+            input_lines.append(f"  out={filename}")
+        if user_header and _classify_url(url) == "hf":
+            input_lines.append(f"  header={user_header}")
+
+    # Keep roughly 16 connections in flight overall instead of 16 per concurrent file.
+    concurrent_downloads = max(1, min(4, len(entries)))
+    connections = 16 // concurrent_downloads
+
     aria2_config = {
-        "console-log-level"         : "error",
-        "summary-interval"          : 10,
-        "header"                    : user_header if "huggingface.co" in url else None,
+        "console-log-level"         : "notice" if callback else "error",
+        "summary-interval"          : 0 if callback else 10,
         "continue"                  : True,
-        "max-connection-per-server" : 16,
+        "max-concurrent-downloads"  : concurrent_downloads,
+        "max-connection-per-server" : connections,
         "min-split-size"            : "1M",
-        "split"                     : 16,
+        "split"                     : connections,
         "dir"                       : download_dir,
-        "out"                       : filename,
-        "_url"                      : url,
+        "input-file"                : "-",
     }
     aria2_args = parse_args(aria2_config)
-    subprocess.run(["aria2c", *aria2_args])
-    
-    if not quiet:
-        elapsed_time = calculate_elapsed_time(start_time)
-        cprint(f"Download of '{filename}' completed. Took {elapsed_time}.", color="green")
+    input_file = "\n".join(input_lines) + "\n"
+
+    if callback is None:
+        result = subprocess.run(["aria2c", *aria2_args], input=input_file, text=True, stdout=subprocess.DEVNULL if quiet else None)
+        return result.returncode
+
+    process = subprocess.Popen(["aria2c", *aria2_args], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    process.stdin.write(input_file)
+    process.stdin.close()
+
+    for line in process.stdout:
+        if "Download complete:" in line:
+            callback()
+        elif "[ERROR]" in line and not quiet:
+            cprint(line.strip(), color="flat_red")
+
+    return process.wait()
 
 def gdown_download(url: str, dst: str, quiet: bool=False):
     """
@@ -96,8 +195,8 @@ def gdown_download(url: str, dst: str, quiet: bool=False):
                 cprint(f"Download completed. Took {elapsed_time}.", color="green")
             return output
 
-    os.chdir(dst)
-    output = gdown.download_folder(url, quiet=True, use_cookies=False)
+    # A trailing separator makes gdown create the Drive folder inside dst, as it did relative to the cwd.
+    output = gdown.download_folder(url, output=os.path.join(dst, ""), quiet=True, use_cookies=False)
 
     if not quiet:
         elapsed_time = calculate_elapsed_time(start_time)
@@ -127,20 +226,39 @@ def gdown_download(url: str, dst: str, quiet: bool=False):
 
 #     return file
 
+@functools.lru_cache(maxsize=512)
+def _resolve_modelname(url: str, user_header: str=None):
+    """
+    Resolves the model filename for a URL, caching the result per (url, user_header).
+    """
+    if url.endswith(SUPPORTED_EXTENSIONS):
+        return os.path.basename(url)
+
+    if _classify_url(url) == "mydrive":
+        filename = os.path.basename(url)
+    else:
+        filename = get_filename(url, user_header=user_header)
+
+    return filename if filename.endswith(SUPPORTED_EXTENSIONS) else None
+
 def get_modelname(url: str, quiet: bool=False, user_header: str=None) -> None:
     """
     Retrieves the model name from a given URL.
 
     Args:
-        url   (str)             : The URL of the model file.
-        quiet (bool, optional)  : If True, suppresses output. Defaults to True.
+        url         (str)           : The URL of the model file.
+        quiet       (bool, optional): If True, suppresses output. Defaults to True.
+        user_header (str, optional) : Optional header for Hugging Face requests, never sent to other hosts. Defaults to None.
 
     Returns:
         str or None: The filename of the model file if it ends with a supported extension, otherwise None.
     """
-    filename = os.path.basename(url) if "drive/MyDrive" in url or url.endswith(SUPPORTED_EXTENSIONS) else get_filename(url, user_header=user_header)
+    # Same rule as the aria2c helpers: the header holds a Hugging Face token
+    if _classify_url(url) != "hf":
+        user_header = None
+    filename = _resolve_modelname(url, user_header=user_header)
 
-    if filename.endswith(SUPPORTED_EXTENSIONS):
+    if filename:
         if not quiet:
             cprint(f"Filename obtained: '{filename}'", color="green")
         return filename
@@ -159,28 +277,42 @@ def download(url: str, dst: str, filename:str= None, user_header: str=None, quie
         dst         (str)           : The directory to download the file to.
         user_header (str, optional) : Optional header to use for the download request. Defaults to None.
     """
-    if not filename:
-        filename = get_modelname(url, quiet=quiet)
+    kind = _classify_url(url)
 
-    if "drive.google.com" in url:
+    if kind == "gdrive":
         gdown_download(url, dst, quiet=quiet)
-    elif "drive/MyDrive" in url:
+        return
+
+    if not filename:
+        filename = get_modelname(url, quiet=quiet, user_header=user_header)
+
+    if kind == "mydrive":
         if not quiet:
             start_time = time.time()
             cprint(f"Copying file '{filename}'...", color="green")
-        Path(os.path.join(dst, filename)).write_bytes(Path(url).read_bytes())
+        shutil.copyfile(url, os.path.join(dst, filename))
         if not quiet:
             elapsed_time = calculate_elapsed_time(start_time)
             cprint(f"Copying completed. Took {elapsed_time}.", color="green")
     else:
-        if "huggingface.co" in url:
-            url = url.replace("/blob/", "/resolve/")
-        aria2_download(dst, filename, url, user_header=user_header, quiet=quiet)
+        aria2_download(dst, filename, _normalize_url(url), user_header=user_header, quiet=quiet)
+
+def _safe_modelname(url: str, user_header: str=None, quiet: bool=False):
+    try:
+        return get_modelname(url, quiet=True, user_header=user_header)
+    except Exception as e:
+        # aria2c still gets the URL and picks a name itself, but the probe failure should not go unnoticed
+        if not quiet:
+            cprint(f"Failed to obtain filename for '{url}' with error: {str(e)}", color="yellow")
+        return None
 
 def batch_download(urls: list, dst: str, desc: str = None, user_header: str = None, quiet: bool = False) -> None:
     """
     Downloads multiple files from a list of URLs.
 
+    Google Drive links and local Drive paths are copied by two workers per host, while every
+    other URL is fetched by a single aria2c process.
+
     Args:
         urls: A list of URLs from which to download files.
         dst: The directory to download the files to.
@@ -190,15 +322,50 @@ def batch_download(urls: list, dst: str, desc: str = None, user_header: str = No
     if desc is None:
         desc = "Downloading..." 
 
-    with ThreadPoolExecutor() as executor:
-        futures = [executor.submit(download, url, dst, user_header=user_header, quiet=True) for url in urls]
-        with tqdm(total=len(futures), unit='file', disable=quiet, desc=cprint(desc, color="green", tqdm_desc=True)) as pbar:
-            for future in as_completed(futures):
-                try:
-                    future.result()
-                    pbar.update(1)
-                except Exception as e:
-                    cprint(f"Failed to download file with error: {str(e)}", color="flat_red")
+    drive_urls = [url for url in urls if _classify_url(url) in ("gdrive", "mydrive")]
+    aria2_urls = [url for url in urls if _classify_url(url) not in ("gdrive", "mydrive")]
+
+    # Drive transfers get a two-worker pool per host, so Drive does not throttle the whole batch and a
+    # busy host never ties up workers that other hosts or the filename probes could use.
+    with contextlib.ExitStack() as stack:
+        pbar = stack.enter_context(tqdm(total=len(urls), unit='file', disable=quiet, desc=cprint(desc, color="green", tqdm_desc=True)))
+        host_pools = {}
+        futures = []
+        for url in drive_urls:
+            netloc = urlparse(url).netloc
+            if netloc not in host_pools:
+                host_pools[netloc] = stack.enter_context(ThreadPoolExecutor(max_workers=2))
+            futures.append(host_pools[netloc].submit(download, url, dst, user_header=user_header, quiet=True))
+
+        if aria2_urls:
+            # The probes have their own pool, so aria2c can start without waiting on Drive copies.
+            with ThreadPoolExecutor(max_workers=min(4, len(aria2_urls))) as executor:
+                filenames = list(executor.map(lambda url: _safe_modelname(url, user_header=user_header, quiet=quiet), aria2_urls))
+            entries = [(_normalize_url(url), filename) for url, filename in zip(aria2_urls, filenames)]
+            completed = []
+
+            def on_complete():
+                completed.append(None)
+                pbar.update(1)
+
+            try:
+                returncode = aria2_batch_download(dst, entries, quiet=quiet, user_header=user_header, callback=on_complete)
+            except Exception as e:
+                # A missing aria2c or a broken pipe must not take the Drive transfers down with it
+                cprint(f"Failed to download {len(aria2_urls) - len(completed)} file(s) with error: {str(e)}", color="flat_red")
+            else:
+                if returncode != 0:
+                    cprint(f"Failed to download some files, aria2c exited with status {returncode}.", color="flat_red")
+            # Failed entries never print "Download complete:", but they still count toward the bar
+            pbar.update(len(aria2_urls) - len(completed))
+
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                cprint(f"Failed to download file with error: {str(e)}", color="flat_red")
+            finally:
+                pbar.update(1)
 
 def get_most_recent_file(directory: str, quiet: bool=False):
     """
@@ -212,13 +379,22 @@ def get_most_recent_file(directory: str, quiet: bool=False):
     """
     cprint(f"Getting filename from most recent file...", color="green")
 
-    files = glob.glob(os.path.join(directory, "*"))
-    if not files:
+    most_recent_file = None
+    most_recent_mtime = None
+
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            mtime = entry.stat().st_mtime
+            if most_recent_mtime is None or mtime > most_recent_mtime:
+                most_recent_file, most_recent_mtime = entry.path, mtime
+
+    if most_recent_file is None:
         if not quiet:
             cprint("No files found in directory.", color="yellow")
         return None
 
-    most_recent_file = max(files, key=os.path.getmtime)
     basename = os.path.basename(most_recent_file)
 
     if basename.endswith(SUPPORTED_EXTENSIONS):
@@ -240,7 +416,7 @@ def get_filepath(url: str, dst: str, quiet: bool=False):
     """
     filename = get_modelname(url, quiet=True)
 
-    if not filename or not filename.endswith(SUPPORTED_EXTENSIONS):
+    if not filename:
         most_recent_file = get_most_recent_file(dst, quiet=quiet)
         filename = os.path.basename(most_recent_file)
 
@@ -1,29 +1,100 @@
 import os
-import gc
+import functools
 import torch
 import json
 import hashlib
 import json
+import zipfile
 from typing import Optional
-from pydantic import BaseModel, ValidationError
-from safetensors.torch import load_file, safe_open
+from concurrent.futures import ProcessPoolExecutor
+import msgspec
+from safetensors.torch import safe_open
 from ..colored_print import cprint
 
-class LoraArgs(BaseModel):
-    conv_dim: Optional[int]
-    conv_alpha: Optional[float]
-    algo: Optional[str]
-    unit: Optional[str]
+class LoraArgs(msgspec.Struct, frozen=True):
+    conv_dim: Optional[int] = None
+    conv_alpha: Optional[float] = None
+    algo: Optional[str] = None
+    unit: Optional[str] = None
+
+class Metadata(msgspec.Struct, frozen=True):
+    ss_network_args: Optional[str] = None
+    ss_network_dim: Optional[int] = None
+    ss_network_alpha: Optional[float] = None
+    ss_network_module: Optional[str] = None
+    lora_key_encoding: Optional[str] = None
+
+_EXPECTED_VAE_HASHES = {
+    'Animevae'                                : 'f921fb3f29891d2a77a6571e56b8b5052420d2884129517a333c60b1b4816cdf',
+    'kl-f8-anime'                             : '2f11c4a99ddc28d0ad8bce0acc38bed310b45d38a3fe4bb367dc30f3ef1a4868',
+    'kl-f8-anime2'                            : 'df3c506e51b7ee1d7b5a6a2bb7142d47d488743c96aa778afb0f53a2cdc2d38d',
+    'autoencoder_fix_kl-f8-trinart_characters': '2453b80bc1716bc3f94496d4e56be891e267051dc43c5144f384b66a73ac8295',
+    'vae-ft-mse-840000-ema-pruned'            : 'c6a580b13a5bc05a5e16e4dbb80608ff2ec251a162311590c1f34c013d7f3dab',
+    'mse840000_klf8anime'                     : '53cfd845736459e78f208786f8d56109093f37dc427e366769416f6ca9ea6fc9',
+    'mse840000_klf8anime_klf8anime2'          : 'a9a44822203eaa05104d37a242ec5af405d0fcfb98a81fb89f0c2e8bb71ae962',
+    'ClearVAE'                                : '600345c503784cd77536d714f0e4c43f9e1fa4379007e730d54c454c66ee36db',
+    'ClearVAE-NansLessTest'                   : '4809659b70d67d314c45062ece33a7f9f8abc9aaf13805173a129cad2664e091',
+    'ClearVAE-Variant'                        : '9c2d6dc265bd4758042cc2385b090aede02d8160b556830e9385db8a74ddcaab',
+    'ACertainThing-0064'                      : '319adc806290ec775f361bac6c68a878a96c9982e1dd77c9545240cc811c4e58',
+    'flat_paint_b_v2'                         : '2da3f767874561a7e0e52ef2c24c8a0ea2997fd267727cfd2981fd9594e8bbd4',
+    'flat_paint_b_v3'                         : '0b4ff3b7be8c164b2a80d3a3a7c5eebc41a11994420a8633abf8190cff9cfc9c',
+    'SD15NewVAEpruned'                        : '27a4ac756c5c4fb25bfb7bd32a700a89fe77a66926338b1d78b97e25e1e85f75'
+}
+
+_VAE_HASH_TO_NAME = {hash_value: vae_name for vae_name, hash_value in _EXPECTED_VAE_HASHES.items()}
+
+# Checked in order; "dylora" comes first because it also contains "lora".
+_LYCORIS_ALGO_TYPES = (
+    ("dylora", "DyLoRA_LyCORIS"),
+    ("locon" , "LoCon"),
+    ("lora"  , "LoCon"),
+    ("loha"  , "LoHA"),
+    ("lokr"  , "LoKR"),
+    ("ia3"   , "IA3"),
+)
+
+_KOHYA_NETWORK_MODULES = ("networks.lora", "networks.dylora")
+
+# (network module, has conv layers) -> LoRA type
+_KOHYA_NETWORK_TYPES = {
+    ("networks.lora"  , True ): "LoRA_C3Lier",
+    ("networks.lora"  , False): "LoRA_LierLa",
+    ("networks.dylora", True ): "DyLoRA_C3Lier",
+    ("networks.dylora", False): "DyLoRA_LierLa",
+}
+
+@functools.lru_cache(maxsize=512)
+def _parse_lora_metadata(lora_path, mtime_ns, size):
+    """
+    Reads and validates the metadata of a safetensors LoRA.
+
+    The modification time and size are part of the cache key, so a file that changed on disk is parsed again.
+
+    Returns:
+        tuple: (metadata, lora_args, error). metadata and lora_args are None if the file has no metadata,
+               and error is a (reason, message) pair if validation failed.
+    """
+    with safe_open(lora_path, framework="pt") as f:
+        raw_metadata = f.metadata()
+
+    if not raw_metadata:
+        return None, None, None
+
+    # safetensors metadata values are all strings, so lax mode is needed to coerce the numeric fields.
+    try:
+        metadata = msgspec.convert(raw_metadata, Metadata, strict=False)
+    except msgspec.ValidationError as e:
+        return None, None, ("Invalid metadata", f"Metadata validation error: {e}")
 
-class Metadata(BaseModel):
-    ss_network_args: Optional[str]
-    ss_network_dim: Optional[int]
-    ss_network_alpha: Optional[float]
-    ss_network_module: Optional[str]
-    lora_key_encoding: Optional[str]
+    try:
+        if metadata.ss_network_args:
+            lora_args = msgspec.json.decode(metadata.ss_network_args, type=LoraArgs, strict=False)
+        else:
+            lora_args = LoraArgs()
+    except msgspec.ValidationError as e:
+        return None, None, ("Invalid lora args", f"Lora args validation error: {e}")
 
-    class Config:
-        arbitrary_types_allowed = True
+    return metadata, lora_args, None
 
 class Validator:
     """
@@ -48,14 +119,15 @@ class Validator:
     @staticmethod
     def validate_model(model_path, map_location="cpu"):
         """
-        Validates the model by attempting to load it.
+        Validates the model by parsing its header.
+
+        Safetensors files are checked by reading their JSON header, and zip-based checkpoints by
+        reading the archive's central directory. Only legacy pickle checkpoints are fully loaded.
         """
         if Validator.is_safetensors(model_path):
             try:
-                tmp = load_file(model_path, device=map_location)
-                del tmp
-                gc.collect()
-                torch.cuda.empty_cache()
+                with safe_open(model_path, framework="pt", device=map_location) as f:
+                    f.keys()
             except Exception as e:
                 print(e)
                 new_model_path = os.path.splitext(model_path)[0] + ".ckpt"
@@ -64,10 +136,15 @@ class Validator:
                 return new_model_path
         elif Validator.is_ckpt(model_path):
             try:
-                tmp = torch.load(model_path, map_location=map_location)
-                del tmp
-                gc.collect()
-                torch.cuda.empty_cache()
+                if zipfile.is_zipfile(model_path):
+                    with zipfile.ZipFile(model_path) as archive:
+                        if not any(name.endswith("data.pkl") for name in archive.namelist()):
+                            raise ValueError(f"'{os.path.basename(model_path)}' is not a PyTorch checkpoint archive")
+                else:
+                    tmp = torch.load(model_path, map_location=map_location)
+                    del tmp
+                    if map_location != "cpu" and torch.cuda.is_available():
+                        torch.cuda.empty_cache()
             except Exception as e:
                 cprint(e)
                 new_model_path = os.path.splitext(model_path)[0] + ".safetensors"
@@ -81,29 +158,17 @@ class Validator:
         """
         Validates the vae by checking if its sha256 hash is in the expected hash list.
         """
-        expected_hash = {
-            'Animevae'                                : 'f921fb3f29891d2a77a6571e56b8b5052420d2884129517a333c60b1b4816cdf',
-            'kl-f8-anime'                             : '2f11c4a99ddc28d0ad8bce0acc38bed310b45d38a3fe4bb367dc30f3ef1a4868',
-            'kl-f8-anime2'                            : 'df3c506e51b7ee1d7b5a6a2bb7142d47d488743c96aa778afb0f53a2cdc2d38d',
-            'autoencoder_fix_kl-f8-trinart_characters': '2453b80bc1716bc3f94496d4e56be891e267051dc43c5144f384b66a73ac8295',
-            'vae-ft-mse-840000-ema-pruned'            : 'c6a580b13a5bc05a5e16e4dbb80608ff2ec251a162311590c1f34c013d7f3dab',
-            'mse840000_klf8anime'                     : '53cfd845736459e78f208786f8d56109093f37dc427e366769416f6ca9ea6fc9',
-            'mse840000_klf8anime_klf8anime2'          : 'a9a44822203eaa05104d37a242ec5af405d0fcfb98a81fb89f0c2e8bb71ae962',
-            'ClearVAE'                                : '600345c503784cd77536d714f0e4c43f9e1fa4379007e730d54c454c66ee36db',
-            'ClearVAE-NansLessTest'                   : '4809659b70d67d314c45062ece33a7f9f8abc9aaf13805173a129cad2664e091',
-            'ClearVAE-Variant'                        : '9c2d6dc265bd4758042cc2385b090aede02d8160b556830e9385db8a74ddcaab', 
-            'ACertainThing-0064'                      : '319adc806290ec775f361bac6c68a878a96c9982e1dd77c9545240cc811c4e58',
-            'flat_paint_b_v2'                         : '2da3f767874561a7e0e52ef2c24c8a0ea2997fd267727cfd2981fd9594e8bbd4',
-            'flat_paint_b_v3'                         : '0b4ff3b7be8c164b2a80d3a3a7c5eebc41a11994420a8633abf8190cff9cfc9c',
-            'SD15NewVAEpruned'                        : '27a4ac756c5c4fb25bfb7bd32a700a89fe77a66926338b1d78b97e25e1e85f75'
-        }
         with open(vae_path, 'rb') as file:
-            contents = file.read()
-        sha256_hash = hashlib.sha256(contents).hexdigest()
-        for vae_name, hash_value in expected_hash.items():
-            if hash_value == sha256_hash:
-                cprint(f"VAE Info: VAE shared the same sha256 with {vae_name}.", color="green")
-                return
+            if hasattr(hashlib, "file_digest"):
+                sha256_hash = hashlib.file_digest(file, "sha256").hexdigest()
+            else:
+                sha256 = hashlib.sha256()
+                for chunk in iter(lambda: file.read(1 << 20), b""):
+                    sha256.update(chunk)
+                sha256_hash = sha256.hexdigest()
+        vae_name = _VAE_HASH_TO_NAME.get(sha256_hash)
+        if vae_name:
+            cprint(f"VAE Info: VAE shared the same sha256 with {vae_name}.", color="green")
 
     @staticmethod
     def validate_lora(lora_path):
@@ -112,24 +177,15 @@ class Validator:
         """
         try:
             if Validator.is_safetensors(lora_path):
-                with safe_open(lora_path, framework="pt") as f:
-                    raw_metadata = f.metadata()
-
-                if raw_metadata:
-                    try:
-                        metadata = Metadata(**raw_metadata)
-                    except ValidationError as e:
-                        cprint(f"Metadata validation error: {e}", color="flat_red")
-                        return False, "Invalid metadata"
-
-                    lora_args_dict = json.loads(metadata.ss_network_args) if metadata.ss_network_args else {}
-                    
-                    try:
-                        lora_args = LoraArgs(**lora_args_dict)
-                    except ValidationError as e:
-                        cprint(f"Lora args validation error: {e}", color="flat_red")
-                        return False, "Invalid lora args"
+                stat = os.stat(lora_path)
+                metadata, lora_args, error = _parse_lora_metadata(lora_path, stat.st_mtime_ns, stat.st_size)
+
+                if error:
+                    reason, message = error
+                    cprint(message, color="flat_red")
+                    return False, reason
 
+                if metadata:
                     lora_type = Validator.validate_kohya_lora(
                         metadata.ss_network_module, lora_args.algo, lora_args.conv_dim, lora_args.conv_alpha
                     )
@@ -162,36 +218,37 @@ class Validator:
         except Exception as e:
             cprint(f"An error occurred: {str(e)}", color="flat_red")
 
+    @staticmethod
+    def batch_validate_lora(lora_paths, max_workers=None):
+        """
+        Validates multiple loras in parallel worker processes.
+
+        Metadata parsing and validation are CPU-bound Python work, so processes are used instead of threads.
+
+        Returns:
+            dict: The result of validate_lora for each path, keyed by path.
+        """
+        lora_paths = list(lora_paths)
+        if not lora_paths:
+            return {}
+
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            results = executor.map(Validator.validate_lora, lora_paths, chunksize=8)
+            return dict(zip(lora_paths, results))
+
     @staticmethod
     def validate_kohya_lora(lora_module, lora_algo, lora_conv_dim, lora_conv_alpha):
         """
         Validates kohya lora by checking its parameters.
         """
-        lora_type = None
-
         if 'lycoris.kohya' in lora_module:
-            if lora_algo:
-                if "locon" in lora_algo or "lora" in lora_algo:
-                    lora_type = "LoCon"
-                elif "loha" in lora_algo:
-                    lora_type = "LoHA"
-                elif "lokr" in lora_algo:
-                    lora_type = "LoKR"
-                elif "ia3" in lora_algo:
-                    lora_type = "IA3"
-                elif "dylora" in lora_algo:
-                    lora_type = "DyLoRA_LyCORIS"
-        elif 'networks.lora' in lora_module:
-            if lora_conv_dim is not None or lora_conv_alpha is not None:
-                lora_type = "LoRA_C3Lier"
-            else:
-                lora_type = "LoRA_LierLa"
-        elif 'networks.dylora' in lora_module:
-            if lora_conv_dim is not None or lora_conv_alpha is not None:
-                lora_type = "DyLoRA_C3Lier"
-            else:
-                lora_type = "DyLoRA_LierLa"
-        else:
-            lora_type = None
+            if not lora_algo:
+                return None
+            return next((lora_type for algo, lora_type in _LYCORIS_ALGO_TYPES if algo in lora_algo), None)
+
+        has_conv = lora_conv_dim is not None or lora_conv_alpha is not None
+        for module in _KOHYA_NETWORK_MODULES:
+            if module in lora_module:
+                return _KOHYA_NETWORK_TYPES[(module, has_conv)]
 
-        return lora_type
\ No newline at end of file
+        return None
\ No newline at end of file
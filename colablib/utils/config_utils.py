@@ -1,9 +1,9 @@
 import json
-import yaml
-import xmltodict
-import toml
-import requests
-import fileinput
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from ..colored_print import cprint
 
 def determine_file_format(filename):
@@ -35,15 +35,27 @@ def read_config(filename):
     file_format = determine_file_format(filename)
 
     if file_format == "json":
-        with open(filename, "r") as f:
-            config = json.load(f)
+        if orjson is not None:
+            with open(filename, "rb") as f:
+                data = f.read()
+            try:
+                config = orjson.loads(data)
+            except orjson.JSONDecodeError:
+                # orjson rejects NaN and Infinity, which json reads and writes
+                config = json.loads(data)
+        else:
+            with open(filename, "r") as f:
+                config = json.load(f)
     elif file_format == "yaml" or file_format == "yml":
+        import yaml
         with open(filename, "r") as f:
-            config = yaml.safe_load(f)
+            config = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
     elif file_format == "xml":
+        import xmltodict
         with open(filename, "r") as f:
             config = xmltodict.parse(f.read())
     elif file_format == "toml":
+        import toml
         with open(filename, "r") as f:
             config = toml.load(f)
     else:
@@ -64,16 +76,20 @@ def write_config(filename, config):
     file_format = determine_file_format(filename)
 
     if file_format == "json":
+        # Always written by json, so the file layout (4-space indent, NaN allowed) doesn't depend on orjson
         with open(filename, "w") as f:
             json.dump(config, f, indent=4)
     elif file_format == "yaml" or file_format == "yml":
+        import yaml
         with open(filename, "w") as f:
-            yaml.dump(config, f)
+            yaml.dump(config, f, Dumper=getattr(yaml, "CDumper", yaml.Dumper))
     elif file_format == "xml":
+        import xmltodict
         with open(filename, "w") as f:
             xml = xmltodict.unparse(config, pretty=True)
             f.write(xml)
     elif file_format == "toml":
+        import toml
         with open(filename, "w") as f:
             toml.dump(config, f)
     else:
@@ -90,11 +106,18 @@ def change_line(filename, old_string, new_string):
         old_string (str): The string to be replaced.
         new_string (str): The string to replace with.
     """
-    with fileinput.input(files=(filename,), inplace=True) as file:
-        for line in file:
-            print(line.replace(old_string, new_string), end='')
+    with open(filename, "r") as f:
+        content = f.read()
+
+    if old_string not in content:
+        return
+
+    with open(filename, "w") as f:
+        f.write(content.replace(old_string, new_string))
 
 def pastebin_reader(id):
+    import requests
+
     if "pastebin.com" in id:
         url = id 
         if 'raw' not in url:
@@ -1,12 +1,86 @@
 import subprocess
 import os
-import requests
+import re
+import shutil
+import configparser
+import contextlib
 import concurrent.futures
 from tqdm import tqdm
 from urllib.parse import urlparse
+from .py_utils import get_session
 from ..colored_print import cprint
 
-def clone_repo(url, cwd=None, directory=None, branch=None, commit_hash=None, recursive=False, quiet=False, batch=False):
+_GIT = shutil.which("git") or "git"
+
+# Git operations wait on the network, not the CPU, so the pool size is independent of the core count.
+# Git hosts rate-limit per IP, so going past this rarely helps.
+_MAX_GIT_WORKERS = int(os.environ.get("COLABLIB_GIT_JOBS", 16))
+
+# Shared by every batch call so repeated batches don't build and tear down a pool each time
+_GIT_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=_MAX_GIT_WORKERS, thread_name_prefix="git")
+
+def _git_pool(max_workers=None):
+    if max_workers:
+        return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    # The shared pool must outlive the `with` block
+    return contextlib.nullcontext(_GIT_POOL)
+
+# Submodules of one repository are fetched in parallel with this many jobs.
+_SUBMODULE_JOBS = 8
+
+# validate_repo results per directory, stored with the file mtimes they were read at
+_repo_info_cache = {}
+
+_CLONING_DESC = cprint("Cloning...", color="green", tqdm_desc=True)
+_UPDATING_DESC = cprint("Updating...", color="green", tqdm_desc=True)
+
+_REPO_NAME_RE = re.compile(r"([^/:]+?)(?:\.git)?/*$")
+
+class RepoResult(str):
+    """
+    Status message of a clone or update that also carries its outcome.
+
+    It is still a str, so callers that print or search the message keep working.
+
+    Attributes:
+        ok     (bool) : Whether the operation succeeded.
+        exists (bool) : Whether the repository was already there.
+        name   (str)  : The repository name.
+        detail (str)  : The error output from git, if any.
+    """
+    def __new__(cls, message, ok=True, exists=False, name=None, detail=""):
+        self = super().__new__(cls, message)
+        self.ok = ok
+        self.exists = exists
+        self.name = name
+        self.detail = detail
+        return self
+
+    @property
+    def color(self):
+        if self.exists:
+            return "yellow"
+        return "green" if self.ok else "red"
+
+def _repo_name(url):
+    match = _REPO_NAME_RE.search(url)
+    return match.group(1) if match else url
+
+def _stderr(result):
+    # Output is captured as bytes and only decoded when it ends up in a message
+    return result.stderr.decode(errors="replace") if result.stderr else ""
+
+def _run_git(args, cwd=None, **kwargs):
+    """
+    Runs a git command in the given directory.
+
+    The absolute git path, `-C` instead of a subprocess cwd and close_fds=False let CPython start
+    git with posix_spawn instead of fork + exec.
+    """
+    cmd = [_GIT, "-C", cwd, *args] if cwd else [_GIT, *args]
+    return subprocess.run(cmd, close_fds=False, **kwargs)
+
+def clone_repo(url, cwd=None, directory=None, branch=None, commit_hash=None, recursive=False, quiet=False, batch=False, depth=None, reference=None, filter=None):
     """
     Clones a Git repository.
 
@@ -17,48 +91,86 @@ def clone_repo(url, cwd=None, directory=None, branch=None, commit_hash=None, rec
         branch      (str, optional)     : The branch to checkout. Defaults to None.
         commit_hash (str, optional)     : The commit hash to checkout. Defaults to None.
         recursive   (bool, optional)    : Flag to recursively clone submodules. Defaults to False.
+        depth       (int, optional)     : Truncate the history to this many commits. Defaults to None (full history).
+        reference   (str, optional)     : A local repository to borrow objects from when it exists. Defaults to None.
+        filter      (str, optional)     : Partial clone filter such as "blob:none". Defaults to None.
     """
     try:
-        parsed_url = urlparse(url).path.split('/')[-1].replace('.git', '')
+        parsed_url = _repo_name(url)
 
         if not directory:
             directory = parsed_url
             
-        if os.path.exists(os.path.join(cwd, parsed_url) if cwd else directory):
-            message = f"Directory '{parsed_url}' already exists."
+        try:
+            # lstat also catches a dangling symlink, which git clone would refuse to overwrite anyway
+            os.lstat(os.path.join(cwd, parsed_url) if cwd else directory)
+        except FileNotFoundError:
+            pass
+        else:
+            message = RepoResult(f"Directory '{parsed_url}' already exists.", exists=True, name=parsed_url)
             if not quiet and not batch:
-                color = "yellow"
-                cprint(message, color=color)
+                cprint(message, color=message.color)
             return message
 
-        cmd = ["git", "clone", url]
+        cmd = ["-c", "protocol.version=2", "clone", "--quiet", url]
         if branch:
             cmd.extend(["-b", branch])
+        if depth:
+            cmd.extend(["--depth", str(depth), "--single-branch"])
+        if commit_hash:
+            # Only the pinned commit gets checked out, so skip materialising the tip first.
+            cmd.append("--no-checkout")
+            if not depth and not filter:
+                filter = "blob:none"
+        if filter:
+            # Servers without partial clone support just ignore the filter with a warning.
+            cmd.append(f"--filter={filter}")
         if recursive:
-            cmd.append("--recursive")
+            cmd.extend(["--recursive", "--jobs", str(_SUBMODULE_JOBS)])
+            if depth:
+                cmd.append("--shallow-submodules")
+        if reference:
+            cmd.extend(["--reference-if-able", reference])
         if directory:
             cmd.append(directory)
 
-        result = subprocess.run(cmd, text=True, cwd=cwd, capture_output=True)
+        result = _run_git(cmd, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+        if commit_hash and result.returncode == 0:
+            repo_path = os.path.join(cwd, directory) if cwd else directory
+            if depth:
+                # A failed fetch leaves nothing at FETCH_HEAD, so report it rather than the checkout error it would cause
+                result = _run_git(["fetch", "--quiet", "--depth", str(depth), "origin", commit_hash], cwd=repo_path, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                commit_hash = "FETCH_HEAD"
+            if result.returncode == 0:
+                result = _run_git(["-c", "advice.detachedHead=false", "checkout", "--quiet", commit_hash], cwd=repo_path, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            if result.returncode != 0:
+                # The clone has no working tree yet, so fall back to the default branch tip rather than leave
+                # every file staged as deleted. If even that fails, drop the clone so a retry starts clean.
+                restored = _run_git(["reset", "--hard", "--quiet", "HEAD"], cwd=repo_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                if restored.returncode != 0:
+                    shutil.rmtree(repo_path, ignore_errors=True)
+            if recursive and os.path.isdir(repo_path):
+                # --recursive has nothing to recurse into until the checkout has happened.
+                submodule_cmd = ["submodule", "update", "--init", "--recursive", "--quiet", "--jobs", str(_SUBMODULE_JOBS)]
+                if depth:
+                    submodule_cmd.extend(["--depth", "1"])
+                submodule_result = _run_git(submodule_cmd, cwd=repo_path, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                if result.returncode == 0:
+                    result = submodule_result
 
         if result.returncode == 0:
-            message = f"Cloning '{parsed_url}' was successful."
+            message = RepoResult(f"Cloning '{parsed_url}' was successful.", name=parsed_url)
         else:
-            message = f"Cloning '{parsed_url}' failed. Error: {result.stderr}"
+            message = RepoResult(f"Cloning '{parsed_url}' failed. Error: {_stderr(result)}", ok=False, name=parsed_url, detail=_stderr(result))
 
         if not quiet and not batch:
-            color = "green" if not any(item in message for item in ["Failed", "Error", "failed", "error"]) else "red"
-            cprint(message, color=color)
-            
-        if commit_hash and directory:
-            checkout_repo(directory, commit_hash, quiet=quiet, batch=batch)
+            cprint(message, color=message.color)
 
     except Exception as e:
-        message = f"Error while cloning the repository: {e}"
+        message = RepoResult(f"Error while cloning the repository: {e}", ok=False, detail=str(e))
         if not quiet and not batch:
-            color = "red"
-            cprint(message, color=color)
-        return None
+            cprint(message, color=message.color)
 
     return message
 
@@ -75,28 +187,36 @@ def checkout_repo(directory, reference, create=False, args="", quiet=False, batc
         batch      (bool)  : Whether this is a batch operation. Defaults to False.
     """
     try:
-        cmd = ["git", "checkout"]
+        cmd = ["checkout", "--quiet"]
         if create:
             cmd.append("-b")
         cmd.append(reference)
         if args:
             cmd.extend(args.split())
 
-        result = subprocess.run(cmd, text=True, cwd=directory, capture_output=True)
+        result = _run_git(cmd, cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
 
         if result.returncode == 0:
-            message = f"Checkout successful. You are now at {reference}"
+            message = RepoResult(f"Checkout successful. You are now at {reference}")
         else:
-            message = f"Checkout failed. Error: {result.stderr}"
+            message = RepoResult(f"Checkout failed. Error: {_stderr(result)}", ok=False, detail=_stderr(result))
     except Exception as e:
-        message = f"An unexpected error occurred while checking out the repository: {str(e)}"
+        message = RepoResult(f"An unexpected error occurred while checking out the repository: {str(e)}", ok=False, detail=str(e))
 
     if not quiet and not batch:
-        color = "red" if "Failed" in message or "Error" in message else "green"
-        cprint(message, color=color)
+        cprint(message, color=message.color)
 
     return message
 
+def _download_patch(url, path):
+    with get_session().get(url, stream=True, timeout=(5, 60)) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+
+        with open(path, 'wb') as file:
+            shutil.copyfileobj(response.raw, file, length=64 * 1024)
+    return path
+
 def patch_repo(url, dir, cwd, path=None, args=None, whitespace_fix=False, quiet=False):
     """
     Function to patch a repo with specified arguments.
@@ -131,12 +251,7 @@ def patch_repo(url, dir, cwd, path=None, args=None, whitespace_fix=False, quiet=
     if url:
         filename = urlparse(url).path.split('/')[-1].replace('.git', '')
         try:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            with open(os.path.join(dir, filename), 'wb') as file:
-                for chunk in response.iter_content(chunk_size=8192):
-                    file.write(chunk)
+            _download_patch(url, os.path.join(dir, filename))
         except Exception as e:
             if not quiet:
                 print(f"Error downloading from {url}. Error: {str(e)}")
@@ -147,7 +262,7 @@ def patch_repo(url, dir, cwd, path=None, args=None, whitespace_fix=False, quiet=
     if not path:
         path = os.path.join(dir, filename)
 
-    cmd = ['git', 'apply']
+    cmd = ['apply']
     if whitespace_fix:
         cmd.append('--whitespace=fix')
     if args:
@@ -155,11 +270,83 @@ def patch_repo(url, dir, cwd, path=None, args=None, whitespace_fix=False, quiet=
     cmd.append(path)
     
     try:
-        return subprocess.run(cmd, cwd=cwd, check=True)
+        return _run_git(cmd, cwd=cwd, check=True)
     except subprocess.CalledProcessError as e:
         if not quiet:
             cprint(f"Error applying patch. Error: {str(e)}", color="flat_red")
 
+def patch_repo_batch(items, dir, cwd, args=None, whitespace_fix=False, quiet=False):
+    """
+    Function to apply several patches to a repo with a single 'git apply'.
+
+    Args:
+        items (list): URLs or local paths of the patches, applied in order.
+        dir (str): Directory to download the patches to.
+        cwd (str): Current working directory.
+        args (list, optional): List of arguments for the 'git apply' command.
+        whitespace_fix (bool, optional): Whether to apply the '--whitespace=fix' argument.
+
+    Returns:
+        list: The items, as passed in, that failed to download or apply.
+    """
+    os.makedirs(dir, exist_ok=True)
+
+    failed = []
+    paths = []
+    # Local path -> the item it came from, so failures are always reported as the caller passed them
+    sources = {}
+
+    # Download every remote patch concurrently, but keep the original order for applying
+    with _git_pool() as executor:
+        jobs = []
+        for i, item in enumerate(items):
+            if urlparse(item).scheme in ("http", "https"):
+                # Gist revisions and the like share a basename, so prefix the position to keep downloads apart
+                filename = f"{i:03d}-" + urlparse(item).path.split('/')[-1].replace('.git', '')
+                jobs.append((item, executor.submit(_download_patch, item, os.path.join(dir, filename))))
+            else:
+                jobs.append((item, None))
+
+        for item, future in jobs:
+            if future is None:
+                paths.append(item)
+                sources[item] = item
+                continue
+            try:
+                path = future.result()
+                paths.append(path)
+                sources[path] = item
+            except Exception as e:
+                failed.append(item)
+                if not quiet:
+                    print(f"Error downloading from {item}. Error: {str(e)}")
+
+    if not paths:
+        return failed
+
+    cmd = ['apply']
+    if whitespace_fix:
+        cmd.append('--whitespace=fix')
+    if args:
+        cmd.extend(args)
+
+    if _run_git([*cmd, '--check', *paths], cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0:
+        result = _run_git([*cmd, *paths], cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            failed.extend(sources[path] for path in paths)
+            if not quiet:
+                cprint(f"Error applying patches. Error: {_stderr(result)}", color="flat_red")
+    else:
+        # Fall back to one patch at a time so the good ones still apply and the broken ones get reported
+        for path in paths:
+            result = _run_git([*cmd, path], cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            if result.returncode != 0:
+                failed.append(sources[path])
+                if not quiet:
+                    cprint(f"Error applying patch {sources[path]}. Error: {_stderr(result)}", color="flat_red")
+
+    return failed
+
 def reset_repo(directory, commit, hard=False, args="", quiet=False):
     """
     Resets a Git repository to a specific commit.
@@ -172,25 +359,24 @@ def reset_repo(directory, commit, hard=False, args="", quiet=False):
         quiet     (bool) : Whether to suppress the output. Defaults to False.
     """
     try:
-        cmd = ["git", "reset"]
+        cmd = ["reset", "--quiet"]
         if hard:
             cmd.append("--hard")
         cmd.append(commit)
         if args:
             cmd.extend(args.split())
 
-        result = subprocess.run(cmd, text=True, cwd=directory, capture_output=True)
+        result = _run_git(cmd, cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
 
         if result.returncode == 0:
-            message = f"Reset successful. The HEAD is now at {commit}"
+            message = RepoResult(f"Reset successful. The HEAD is now at {commit}")
         else:
-            message = f"Reset failed. Error: {result.stderr}"
+            message = RepoResult(f"Reset failed. Error: {_stderr(result)}", ok=False, detail=_stderr(result))
     except Exception as e:
-        message = f"An unexpected error occurred while resetting the repository: {str(e)}"
+        message = RepoResult(f"An unexpected error occurred while resetting the repository: {str(e)}", ok=False, detail=str(e))
 
     if not quiet:
-        color = "red" if "Failed" in message or "Error" in message else "green"
-        cprint(message, color=color)
+        cprint(message, color=message.color)
 
     return message
 
@@ -209,47 +395,67 @@ def update_repo(fetch=False, pull=True, origin=None, cwd=None, args="", quiet=Fa
     """
 
     try:
-        repo_name, _, _ = validate_repo(cwd)
+        repo_name, current_commit_hash, current_branch = validate_repo(cwd)
 
         message = ""
+        ok = True
+        detail = ""
 
         if fetch:
-            cmd = ["git", "fetch"]
+            cmd = ["fetch", "--quiet"]
             if origin:
                 cmd.append(origin)
-            result = subprocess.run(cmd, text=True, cwd=cwd, capture_output=True)
+            result = _run_git(cmd, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
 
             if result.returncode != 0:
-                message = f"Error while fetching the repository in {cwd}: {result.stderr}"
+                message = f"Error while fetching the repository in {cwd}: {_stderr(result)}"
+                ok, detail = False, _stderr(result)
+
+        if pull and not fetch and not args:
+            # Asking the remote for the upstream tip is much cheaper than a pull that ends up doing nothing
+            remote, merge_ref = _get_upstream(_git_dir(cwd), current_branch)
+            if remote and merge_ref:
+                result = _run_git(["ls-remote", remote, merge_ref], cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                if result.returncode == 0 and result.stdout.split(b"\t", 1)[0] == current_commit_hash.encode():
+                    pull = False
 
         if pull:
-            cmd = ["git", "pull"]
-            if args:
-                cmd.extend(args.split(" "))
-            result = subprocess.run(cmd, text=True, cwd=cwd, capture_output=True)
+            if fetch and not origin and not args and not message:
+                # The fetch above already brought in the upstream, so merge it locally instead of letting
+                # `git pull` fetch everything a second time.
+                cmd = ["merge", "--quiet", "--ff-only", "@{upstream}"]
+            else:
+                cmd = ["pull", "--quiet"]
+                if args:
+                    cmd.extend(args.split(" "))
+            result = _run_git(cmd, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+            # A fast-forward may land within the mtime resolution, so don't trust the cached HEAD
+            _repo_info_cache.pop(cwd, None)
 
             if result.returncode != 0:
-                message = f"Error while pulling the repository in {cwd}: {result.stderr}"
-            elif "Already up to date." in result.stdout:
+                message = f"Error while pulling the repository in {cwd}: {_stderr(result)}"
+                ok, detail = False, _stderr(result)
+            elif validate_repo(cwd)[1] == current_commit_hash:
                 # message = f"'{repo_name}' is already up to date."
                 pass
             else:
                 message = f"'{repo_name}' updated to the latest version"
+                ok, detail = True, ""
+
+        message = RepoResult(message, ok=ok, name=repo_name, detail=detail)
 
         if not quiet and not batch:
-            color = "green" if not any(item in message for item in ["Failed", "Error", "failed", "error"]) else "red"
-            cprint(message, color=color)
+            cprint(message, color=message.color)
 
     except Exception as e:
-        message = f"Error while updating the repository: {e}"
+        message = RepoResult(f"Error while updating the repository: {e}", ok=False, detail=str(e))
         if not quiet and not batch:
-            color = "red"
-            cprint(message, color=color)
-        return None
+            cprint(message, color=message.color)
 
     return message
 
-def batch_clone(urls, desc=None, cwd=None, directory=None, branch=None, commit_hash=None, recursive=False, quiet=False):
+def batch_clone(urls, desc=None, cwd=None, directory=None, branch=None, commit_hash=None, recursive=False, quiet=False, max_workers=None, reference=None, depth=None, filter=None):
     """
     Clones multiple Git repositories in parallel.
 
@@ -261,37 +467,48 @@ def batch_clone(urls, desc=None, cwd=None, directory=None, branch=None, commit_h
         branch      (str, optional)     : The branch to checkout. Defaults to None.
         commit_hash (str, optional)     : The commit hash to checkout. Defaults to None.
         recursive   (bool, optional)    : Flag to recursively clone submodules. Defaults to False.
+        max_workers (int, optional)     : Number of concurrent clones. Defaults to the shared pool of COLABLIB_GIT_JOBS (16) workers.
+        reference   (str, optional)     : A local repository to borrow objects from when it exists. Defaults to None.
+        depth       (int, optional)     : Truncate the history of every clone to this many commits. Defaults to None.
+        filter      (str, optional)     : Partial clone filter such as "blob:none". Defaults to None.
     """
     if desc is None:
-        desc = cprint("Cloning...", color="green", tqdm_desc=True)
-
-    results = {}  # Store clone status messages
+        desc = _CLONING_DESC
+
+    results = []  # Store clone status messages
+
+    # List the target directory once instead of letting every worker stat its own path
+    to_clone = urls
+    if not directory:
+        base = cwd or "."
+        existing = {entry.name for entry in os.scandir(base)} if os.path.isdir(base) else set()
+        to_clone = []
+        for url in urls:
+            name = _repo_name(url)
+            if name in existing:
+                results.append(RepoResult(f"Directory '{name}' already exists.", exists=True, name=name))
+            else:
+                to_clone.append(url)
 
     # Use a ThreadPoolExecutor to clone repositories in parallel
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = {executor.submit(clone_repo, url, cwd=cwd, directory=directory, branch=branch, commit_hash=commit_hash, recursive=recursive, quiet=quiet, batch=True): url for url in urls}
-        for future in tqdm(concurrent.futures.as_completed(futures), total=len(urls), desc=desc):
+    with _git_pool(max_workers) as executor:
+        futures = {executor.submit(clone_repo, url, cwd=cwd, directory=directory, branch=branch, commit_hash=commit_hash, recursive=recursive, quiet=quiet, batch=True, reference=reference, depth=depth, filter=filter): url for url in to_clone}
+        for future in tqdm(concurrent.futures.as_completed(futures), total=len(urls), initial=len(urls) - len(to_clone), desc=desc):
             try:
-                results[future] = future.result()
+                results.append(future.result())
             except Exception as e:
-                cprint(f"Error while cloning a repository: {e}", color="flat_red")
-                return None
+                # Keep going so one bad repository doesn't throw away the clones that already finished
+                results.append(RepoResult(f"Error while cloning '{futures[future]}': {e}", ok=False, detail=str(e)))
             
     if not quiet:
-        if not any(message for message in results.values()):
+        if not any(results):
                 cprint()
-        for future, message in results.items():
+        for message in results:
             if message:
-                if "already exists" in message.lower():
-                    color = "yellow"
-                elif not any(item.lower() in message.lower() for item in ["failed", "error"]):
-                    color = "green"
-                else:
-                    color = "red"
-                cprint(" [-]", message, color=color)
+                cprint(" [-]", message, color=message.color)
         cprint()
 
-def batch_update(fetch=False, pull=True, origin=None, directory=None, args="", quiet=False, desc=None):
+def batch_update(fetch=False, pull=True, origin=None, directory=None, args="", quiet=False, desc=None, max_workers=None):
     """
     Updates multiple Git repositories in parallel using fetch and/or pull.
 
@@ -303,37 +520,157 @@ def batch_update(fetch=False, pull=True, origin=None, directory=None, args="", q
         args        (str, optional)         : Additional arguments for the git command. Defaults to "".
         quiet       (bool, optional)        : Flag to suppress print update status. Defaults to True.
         desc        (str, optional)         : The description to display on the progress bar. Defaults to "Updating...".
+        max_workers (int, optional)         : Number of concurrent updates. Defaults to the shared pool of COLABLIB_GIT_JOBS (16) workers.
     """
     if not isinstance(directory, list):
-        directory = [os.path.join(directory, name) for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name))]
+        # Only hand actual repositories to the workers; `.git` is a file in submodules and worktrees
+        with os.scandir(directory) as entries:
+            directory = [entry.path for entry in entries if entry.is_dir() and os.path.exists(os.path.join(entry.path, ".git"))]
 
     if desc is None:
-        desc = cprint("Updating...", color="green", tqdm_desc=True)
+        desc = _UPDATING_DESC
 
     results = {}  # Store update status messages
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+    with _git_pool(max_workers) as executor:
         futures = {executor.submit(update_repo, fetch=fetch, pull=pull, origin=origin, cwd=cwd, args=args, quiet=quiet, batch=True): cwd for cwd in directory}
         for future in tqdm(concurrent.futures.as_completed(futures), total=len(directory), desc=desc):
             try:
                 results[future] = future.result()  # Store update status message
             except Exception as e:
-                cprint(f"Error while updating a repository: {e}", color="flat_red")
-                return None
+                results[future] = RepoResult(f"Error while updating the repository in {futures[future]}: {e}", ok=False, detail=str(e))
 
     if not quiet:
         if not any(message for message in results.values()):
                 cprint()
         for future, message in results.items():
             if message:
-                if not any(item.lower() in message.lower() for item in ["failed", "error"]):
-                    color = "green"
-                else:
-                    if "already exists" in message.lower():
-                        color = "yellow"
-                    else:
-                        color = "red"
-                cprint(f" [-]", message, color=color)
+                cprint(f" [-]", message, color=message.color)
+
+def _git_dir(directory):
+    # Like git itself, start from the current directory and walk up to the enclosing repository
+    current = os.path.abspath(directory or os.getcwd())
+    while True:
+        git_path = os.path.join(current, ".git")
+        if os.path.isfile(git_path):
+            # Submodules and worktrees point at their real git directory from a `.git` file.
+            with open(git_path) as f:
+                git_path = os.path.join(current, f.read().partition("gitdir:")[2].strip())
+            return os.path.normpath(git_path)
+        if os.path.isdir(git_path):
+            return os.path.normpath(git_path)
+        parent = os.path.dirname(current)
+        if parent == current:
+            break
+        current = parent
+
+    # Bare repositories and GIT_DIR overrides have no `.git` to find, so ask git
+    result = _run_git(["rev-parse", "--absolute-git-dir"], cwd=directory, capture_output=True, text=True)
+    if result.returncode == 0 and result.stdout.strip():
+        return os.path.normpath(result.stdout.strip())
+    return os.path.normpath(os.path.join(directory or os.getcwd(), ".git"))
+
+def _common_dir(git_dir):
+    # Linked worktrees keep their refs and config in the main repository's git directory
+    try:
+        with open(os.path.join(git_dir, "commondir")) as f:
+            return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    except OSError:
+        return git_dir
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+def _get_remote_url(directory, git_dir):
+    config = configparser.ConfigParser(strict=False, allow_no_value=True, interpolation=None)
+    try:
+        config.read(os.path.join(_common_dir(git_dir), "config"))
+        return config.get('remote "origin"', "url", fallback="")
+    except configparser.Error:
+        result = _run_git(["config", "--get", "remote.origin.url"], cwd=directory, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else ""
+
+def _get_upstream(git_dir, branch):
+    config = configparser.ConfigParser(strict=False, allow_no_value=True, interpolation=None)
+    try:
+        config.read(os.path.join(_common_dir(git_dir), "config"))
+        section = f'branch "{branch}"'
+        return config.get(section, "remote", fallback=None), config.get(section, "merge", fallback=None)
+    except configparser.Error:
+        return None, None
+
+def _head_ref(git_dir):
+    # The ref HEAD points at, e.g. "refs/heads/main", or None when detached or unreadable
+    try:
+        with open(os.path.join(git_dir, "HEAD")) as f:
+            head = f.read().strip()
+    except OSError:
+        return None
+    return head[4:].strip() if head.startswith("ref:") else None
+
+def _read_head(git_dir):
+    """
+    Resolves HEAD straight from the files in the git directory.
+
+    Returns:
+        tuple: The commit hash and the branch ("HEAD" when detached), or None if it can't be resolved without git.
+    """
+    try:
+        with open(os.path.join(git_dir, "HEAD")) as f:
+            head = f.read().strip()
+    except OSError:
+        return None
+
+    if not head.startswith("ref:"):
+        return head, "HEAD"
+
+    ref = head[4:].strip()
+    branch = ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else ref
+
+    common_dir = _common_dir(git_dir)
+    try:
+        with open(os.path.join(common_dir, ref)) as f:
+            commit_hash = f.read().strip()
+        return (commit_hash, branch) if not commit_hash.startswith("ref:") else None
+    except OSError:
+        pass
+
+    try:
+        with open(os.path.join(common_dir, "packed-refs")) as f:
+            for line in f:
+                commit_hash, _, name = line.rstrip("\n").partition(" ")
+                if name == ref:
+                    return commit_hash, branch
+    except OSError:
+        pass
+
+    return None
+
+def _read_repo_info(directory, git_dir):
+    head = _read_head(git_dir)
+    if head is None:
+        # Unborn branches, reftable repositories and other unusual layouts go through git itself
+        result = _run_git(["rev-parse", "HEAD", "--abbrev-ref", "HEAD"], cwd=directory, capture_output=True, text=True)
+        if result.returncode == 0:
+            head = (result.stdout.splitlines() + ["", ""])[:2]
+        else:
+            # git stops at the first bad revision, but run one at a time each still echoes what it was given
+            head = [
+                _run_git(rev_args, cwd=directory, capture_output=True, text=True).stdout.strip()
+                for rev_args in (["rev-parse", "HEAD"], ["rev-parse", "--abbrev-ref", "HEAD"])
+            ]
+    current_commit_hash, current_branch = head
+
+    url = _get_remote_url(directory, git_dir)
+    if not url:
+        raise ValueError(f"Failed to get repository name for directory: {directory}")
+    repo_name = url.split("/")[-1].split(".")[0]  # Extract the repository name
+    username = url.split("/")[-2]  # Extract the username
+
+    return f"{username}/{repo_name}", current_commit_hash, current_branch
 
 def validate_repo(directory):
     """
@@ -345,28 +682,23 @@ def validate_repo(directory):
     Returns:
         tuple: The repository name, the current commit hash, and the current branch.
     """
-
-    def get_current_commit_hash():
-        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=directory)
-        return result.stdout.strip()
-
-    def get_current_branch():
-        result = subprocess.run(["git", "rev-parse", "--abbrev-ref", "HEAD"], capture_output=True, text=True, cwd=directory)
-        return result.stdout.strip()
-
-    def get_repo_name():
-        result = subprocess.run(["git", "config", "--get", "remote.origin.url"], capture_output=True, text=True, cwd=directory)
-        output = result.stdout.strip()
-        if result.returncode == 0 and output:
-            url = output
-            repo_name = url.split("/")[-1].split(".")[0]  # Extract the repository name
-            username = url.split("/")[-2]  # Extract the username
-            return f"{username}/{repo_name}"
-        else:
-            raise ValueError(f"Failed to get repository name for directory: {directory}")
-
-    current_commit_hash = get_current_commit_hash()
-    current_branch = get_current_branch()
-    repo_name = get_repo_name()
-
-    return repo_name, current_commit_hash, current_branch
\ No newline at end of file
+    git_dir = _git_dir(directory)
+    common_dir = _common_dir(git_dir)
+    # Commits, resets and pulls can move the branch ref without touching HEAD or the index (reset --soft
+    # leaves the index alone), so the resolved ref and packed-refs are part of the key as well
+    key = (
+        git_dir,
+        _mtime_ns(os.path.join(git_dir, "HEAD")),
+        _mtime_ns(os.path.join(git_dir, "index")),
+        _mtime_ns(os.path.join(common_dir, "config")),
+        _mtime_ns(os.path.join(common_dir, _head_ref(git_dir) or "HEAD")),
+        _mtime_ns(os.path.join(common_dir, "packed-refs")),
+    )
+
+    cached = _repo_info_cache.get(directory)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    info = _read_repo_info(directory, git_dir)
+    _repo_info_cache[directory] = (key, info)
+    return info
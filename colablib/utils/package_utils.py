@@ -3,9 +3,71 @@ import os
 import zipfile
 import rarfile
 import shutil
-from collections import defaultdict
+import tarfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from ..colored_print import cprint
 
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+_COPY_BUFSIZE = 1024 * 1024
+
+# Below this size starting worker processes costs more than the extraction itself.
+_PARALLEL_ZIP_MIN_SIZE = 8 * 1024 * 1024
+
+def _member_path(target_directory, name):
+    # Same sanitising as ZipFile.extract: drop absolute prefixes and '..' components
+    parts = [part for part in name.split('/') if part not in ('', '.', '..')]
+    return os.path.join(target_directory, *parts) if parts else None
+
+def _extract_zip_members(package_name, members):
+    with zipfile.ZipFile(package_name, 'r') as zip_ref:
+        infolist = zip_ref.infolist()
+        for index, path in members:
+            with zip_ref.open(infolist[index]) as source, open(path, 'wb', buffering=0) as target:
+                shutil.copyfileobj(source, target, _COPY_BUFSIZE)
+
+def _run_zip_extraction(package_name, members, directories):
+    # Create every directory up front in sorted order, so parents exist before their children
+    for directory in sorted(directories):
+        os.makedirs(directory, exist_ok=True)
+
+    workers = min(4, os.cpu_count() or 1, len(members))
+    if workers > 1 and os.path.getsize(package_name) >= _PARALLEL_ZIP_MIN_SIZE:
+        # Inflating is CPU-bound, so spread the members over processes that each open the archive
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_extract_zip_members, [package_name] * workers, [members[i::workers] for i in range(workers)]))
+    else:
+        _extract_zip_members(package_name, members)
+
+def _extract_zip(package_name, target_directory):
+    members = []
+    directories = set()
+    with zipfile.ZipFile(package_name, 'r') as zip_ref:
+        for index, info in enumerate(zip_ref.infolist()):
+            path = _member_path(target_directory, info.filename)
+            if path is None:
+                continue
+            if info.is_dir():
+                directories.add(path)
+            else:
+                directories.add(os.path.dirname(path))
+                members.append((index, path))
+
+    _run_zip_extraction(package_name, members, directories)
+
+def _dir_prefixes(name):
+    # "a/b/c.txt" -> ["a", "a/b"]
+    prefixes = []
+    pos = name.find('/')
+    while pos != -1:
+        prefixes.append(name[:pos])
+        pos = name.find('/', pos + 1)
+    return prefixes
+
 def extract_package(package_name, target_directory, overwrite=False):
     """
     Extracts a package. The package can be in either tar, lz4, rar, or zip format.
@@ -25,7 +87,17 @@ def extract_package(package_name, target_directory, overwrite=False):
     if not os.path.exists(target_directory):
         os.makedirs(target_directory)
 
-    if package_name.endswith(".tar.lz4"):
+    if package_name.endswith(".tar.lz4") and lz4 is not None:
+        try:
+            # Decompress and untar in one streaming pass instead of piping through tar and lz4 processes
+            with lz4.frame.open(package_name, 'rb') as lz4_file, tarfile.open(fileobj=lz4_file, mode='r|') as tar_ref:
+                if hasattr(tarfile, "tar_filter"):
+                    tar_ref.extractall(target_directory, filter="tar")
+                else:
+                    tar_ref.extractall(target_directory)
+        except Exception as e:
+            cprint(f"Package extraction failed with error: {str(e)}", color="flat_red")
+    elif package_name.endswith(".tar.lz4"):
         tar_args = ["tar", "-xI", "lz4", "-f", package_name, "--directory", target_directory]
         if overwrite:
             tar_args.append("--overwrite-dir")
@@ -36,8 +108,7 @@ def extract_package(package_name, target_directory, overwrite=False):
             cprint(f"Package extraction failed with error: {e.output.decode()}", color="flat_red")
     elif package_name.endswith(".zip"):
         try:
-            with zipfile.ZipFile(package_name, 'r') as zip_ref:
-                zip_ref.extractall(target_directory)
+            _extract_zip(package_name, target_directory)
         except Exception as e:
             cprint(f"Package extraction failed with error: {str(e)}", color="flat_red")
     elif package_name.endswith(".rar"):
@@ -59,29 +130,34 @@ def nested_zip_extractor(zip_path, extract_to):
     """
     try:
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            dir_map = defaultdict(list)
-            for name in zip_ref.namelist():
-                if not name.endswith('/'):
-                    parts = name.split('/')
-                    for i in range(1, len(parts)):
-                        dir_map['/'.join(parts[:i])].append(name)
-
-            subfolders = [folder for folder in dir_map.keys() if len(dir_map[folder]) > 0]
-            if len(subfolders) == 1:
-                extract_to = os.path.join(extract_to, subfolders[0])
-
-            for member in zip_ref.infolist():
+            infolist = zip_ref.infolist()
+
+            # Number of files below every directory, without keeping the file names themselves
+            file_counts = Counter()
+            for info in infolist:
+                if not info.filename.endswith('/'):
+                    file_counts.update(_dir_prefixes(info.filename))
+
+            if len(file_counts) == 1:
+                extract_to = os.path.join(extract_to, next(iter(file_counts)))
+
+            # Keyed by target path so that, as before, the last member written to a path wins
+            targets = {}
+            for index, member in enumerate(infolist):
                 if not member.is_dir():
-                    parts = member.filename.split('/')
-                    for i in range(len(parts) - 1, 0, -1):
-                        directory = '/'.join(parts[:i])
-                        if len(dir_map[directory]) > 1 or i == 1:
-                            target_path = os.path.join(extract_to, *parts[i-1:])
-                            os.makedirs(os.path.dirname(target_path), exist_ok=True)
-                            with zip_ref.open(member) as source, open(target_path, 'wb') as target:
-                                shutil.copyfileobj(source, target)
+                    prefixes = _dir_prefixes(member.filename)
+                    # Keep the path from the deepest directory that holds more than one file
+                    for i in range(len(prefixes) - 1, -1, -1):
+                        if file_counts[prefixes[i]] > 1 or i == 0:
+                            relative = member.filename[len(prefixes[i - 1]) + 1:] if i else member.filename
+                            target_path = _member_path(extract_to, relative)
+                            if target_path:
+                                targets[target_path] = index
                             break
 
+        members = [(index, path) for path, index in targets.items()]
+        _run_zip_extraction(zip_path, members, {os.path.dirname(path) for path in targets})
+
     except FileNotFoundError:
         cprint(f"The file {zip_path} does not exist.", color="flat_red")
     except PermissionError:
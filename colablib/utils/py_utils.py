@@ -1,13 +1,26 @@
 import os
-import math
+import functools
 import re
 import requests
+import stat
 import subprocess
 import sys
+import threading
 import time 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urlparse, unquote
 from ..colored_print import cprint
 
+_thread_local = threading.local()
+
+# URLs whose path already ends in the served filename, so no request is needed.
+_FILENAME_FAST_PATHS = (
+    re.compile(r"huggingface\.co/.+?/(?:resolve|blob)/[^/]+/(?P<name>[^?#]+)"),
+)
+_CD_FILENAME_RE = re.compile(r"""filename\*?=(?:[\w-]+'[\w-]*')?"?([^";]+)"?""", re.IGNORECASE)
+
+@functools.lru_cache(maxsize=None)
 def is_google_colab():
     """
     Checks if the current environment is Google Colab.
@@ -21,12 +34,32 @@ def is_google_colab():
     except ImportError:
         return False
 
-def calculate_elapsed_time(start_time):
+def get_session():
+    """
+    Returns a pooled requests.Session for the calling thread.
+
+    Each thread gets its own session, created on first use, so keep-alive connections are
+    reused across requests without sharing a session between threads.
+
+    Returns:
+        requests.Session: The session for the current thread.
+    """
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=Retry(total=3, backoff_factor=0.3))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _thread_local.session = session
+    return session
+
+def calculate_elapsed_time(start_time, now=None):
     """
     Calculate the elapsed time between a given start time and the current time.
 
     Args:
         start_time (float): The start time in seconds since the epoch.
+        now (float, optional): The end time, from the same clock as start_time (e.g. time.monotonic()). Defaults to time.time().
 
     Returns:
         str: A formatted string representing the elapsed time.
@@ -37,19 +70,24 @@ def calculate_elapsed_time(start_time):
         >>> calculate_elapsed_time(time.time() - 120)
         '2 mins 0 sec'
     """
-    end_time = time.time()
-    elapsed_time = int(end_time - start_time)
+    if now is None:
+        now = time.time()
+    mins, secs = divmod(int(now - start_time), 60)
 
-    if elapsed_time < 60:
-        return f"{elapsed_time} sec"
-    else:
-        mins, secs = divmod(elapsed_time, 60)
-        return f"{mins} mins {secs} sec"
+    if mins == 0:
+        return f"{secs} sec"
+    return f"{mins} mins {secs} sec"
     
+@functools.lru_cache(maxsize=512)
 def get_filename(url, user_header=None):
     """
     Extracts the filename from the given URL.
 
+    Hugging Face file URLs are resolved from the path without a request. Otherwise only
+    the response headers are requested: a HEAD request is tried first, and a single-byte
+    ranged GET is used as a fallback for servers that reject HEAD or omit the
+    Content-Disposition header. Results are cached per URL and header.
+
     Args:
         url (str): The URL to extract the filename from.
         user_header (str, optional): The user header. Defaults to None.
@@ -57,23 +95,36 @@ def get_filename(url, user_header=None):
     Returns:
         str: The filename.
     """
+    for pattern in _FILENAME_FAST_PATHS:
+        match = pattern.search(url)
+        if match:
+            return unquote(os.path.basename(match.group("name")))
+
     headers = {}
 
     if user_header:
         headers['Authorization'] = user_header
 
-    response = requests.get(url, stream=True, headers=headers)
-    response.raise_for_status()
+    response = get_session().head(url, allow_redirects=True, timeout=10, headers=headers)
+
+    if not response.ok or 'content-disposition' not in response.headers:
+        head_ok = response.ok
+        response = get_session().get(url, stream=True, timeout=10, headers={**headers, 'Range': 'bytes=0-0'})
+        response.close()
+        # A server that answered HEAD just has no filename header; ranges can still fail (416 on empty files)
+        if not head_ok:
+            response.raise_for_status()
 
-    if 'content-disposition' in response.headers:
-        content_disposition = response.headers['content-disposition']
-        filename = re.findall('filename="?([^"]+)"?', content_disposition)[0]
+    match = response.ok and _CD_FILENAME_RE.search(response.headers.get('content-disposition', ''))
+    if match:
+        filename = unquote(match.group(1))
     else:
         url_path = urlparse(url).path
         filename = unquote(os.path.basename(url_path))
 
     return filename
 
+@functools.lru_cache(maxsize=None)
 def get_python_version():
     """
     Retrieves the current Python version.
@@ -83,6 +134,12 @@ def get_python_version():
     """
     return sys.version
 
+@functools.lru_cache(maxsize=None)
+def _torch_version():
+    # A failed import raises and is not cached, so installing torch later in the session is picked up
+    import torch
+    return torch.__version__
+
 def get_torch_version():
     """
     Retrieves the current PyTorch version.
@@ -91,12 +148,21 @@ def get_torch_version():
         str: The PyTorch version.
     """
     try: 
-        import torch
-        return torch.__version__
+        return _torch_version()
     except ImportError:
         cprint("Failed to retrieve PyTorch version: PyTorch is not installed.", color="flat_red")
         return None
 
+@functools.lru_cache(maxsize=None)
+def _query_gpu():
+    # The GPU can't change for the life of the process, so nvidia-smi only has to run once.
+    # Failures raise and are not cached.
+    command = ["nvidia-smi", "--query-gpu=gpu_name", "--format=csv"]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return result.stdout.strip()
+
 def get_gpu_info(get_gpu_name=False):
     """
     Retrieves the GPU info.
@@ -107,17 +173,10 @@ def get_gpu_info(get_gpu_name=False):
     Returns:
         str: The GPU info.
     """
-    command = ["nvidia-smi", "--query-gpu=gpu_name", "--format=csv"]
-    result = subprocess.run(command, capture_output=True, text=True)
-
-    if result.returncode == 0:
-        gpu_info = result.stdout.strip()
-        if get_gpu_name:
-            if 'name' in gpu_info:
-                return gpu_info[5:]
-        return gpu_info
-    else:
-        error_message = result.stderr.strip()
+    try:
+        gpu_info = _query_gpu()
+    except RuntimeError as e:
+        error_message = str(e)
         if "NVIDIA-SMI has failed" in error_message and "No devices were found" in error_message:
             if is_google_colab():
                 from google.colab import runtime
@@ -126,6 +185,13 @@ def get_gpu_info(get_gpu_name=False):
         else:
             raise RuntimeError(f"Command execution failed with error: {error_message}")
 
+    if get_gpu_name:
+        # The first CSV row is the "name" header, one GPU per row after it
+        lines = gpu_info.splitlines()
+        if len(lines) >= 2:
+            return "\n".join(line.strip() for line in lines[1:])
+    return gpu_info
+
 def convert_size(size_bytes: int) -> str:
     """
     Convert the given size in bytes to a more readable format.
@@ -139,8 +205,9 @@ def convert_size(size_bytes: int) -> str:
     if size_bytes == 0:
         return "0B"
     size_name = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, i)
+    # Every 10 bits is one step of 1024; integer math avoids log() rounding at exact powers
+    i = min((int(size_bytes).bit_length() - 1) // 10, len(size_name) - 1)
+    p = 1 << (10 * i)
     s = round(size_bytes / p, 2)
     return f"{s} {size_name[i]}"
 
@@ -154,9 +221,13 @@ def get_file_size(zip_path: str) -> str:
     Returns:
         str: The size of the file in a more readable format (KB, MB, GB, etc.).
     """
-    if not os.path.isfile(zip_path):
+    # One stat for both the file check and the size; each is a round trip on FUSE-mounted drives
+    try:
+        st = os.stat(zip_path)
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
         raise ValueError(f"'{zip_path}' is not a valid file path.")
 
-    initial_size = os.path.getsize(zip_path)
-    return convert_size(initial_size)
+    return convert_size(st.st_size)
 
@@ -1,11 +1,19 @@
 import os
 import zipfile
-import requests
 import shutil
-from .py_utils import get_filename
+import subprocess
+import tempfile
+from .py_utils import get_filename, get_session
 from tqdm import tqdm
 from ..colored_print import cprint
 
+def _download(url, file):
+    # Same pooled session as get_filename, so the download can reuse the probe's connection
+    with get_session().get(url, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        shutil.copyfileobj(response.raw, file, length=1 << 20)
+
 def ubuntu_deps(url, dst, desc=None):
     """
     Downloads, extracts, and installs .deb files from a given URL.
@@ -16,31 +24,40 @@ def ubuntu_deps(url, dst, desc=None):
     """
     os.makedirs(dst, exist_ok=True)
     filename  = get_filename(url)
-    
-    response = requests.get(url, stream=True)
-    response.raise_for_status()
-    
-    with open(filename, 'wb') as file:
-        for chunk in response.iter_content(chunk_size=8192):
-            file.write(chunk)
 
     if filename.endswith(".zip"):
-        with zipfile.ZipFile(filename, "r") as deps:
-            deps.extractall(dst)
+        with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as buffer:
+            _download(url, buffer)
+            buffer.seek(0)
+            with zipfile.ZipFile(buffer, "r") as deps:
+                deps.extractall(dst)
+                # The archive already lists what was extracted, so there's no need to scan dst again
+                deb_files = [os.path.join(dst, name) for name in deps.namelist() if name.endswith('.deb')]
 
         if desc is None:
             desc = cprint("Installing...", color="green", tqdm_desc=True)
 
-        deb_files = [os.path.join(dst, f) for f in os.listdir(dst) if f.endswith('.deb')]
-        for deb_file in tqdm(deb_files, desc=desc):
-            os.system(f'dpkg -i {deb_file}')
-            
-        os.remove(filename)
+        if deb_files:
+            with tqdm(total=len(deb_files), desc=desc, miniters=max(1, len(deb_files) // 50), mininterval=0.25, smoothing=0) as pbar:
+                # One dpkg run for all packages; its untranslated "Setting up" lines drive the progress bar
+                process = subprocess.Popen(["dpkg", "-i", *deb_files], stdout=subprocess.PIPE, text=True, errors="replace", env={**os.environ, "LC_ALL": "C"})
+                for line in process.stdout:
+                    if line.startswith("Setting up "):
+                        pbar.update(1)
+                returncode = process.wait()
+
+            if returncode != 0:
+                cprint(f"dpkg exited with status {returncode} while installing packages.", color="flat_red")
+
         shutil.rmtree(dst)
 
     elif filename.endswith(".deb"):
         deb_file = os.path.join(dst, filename)
-        os.system(f'dpkg -i {deb_file}')
+        with open(deb_file, 'wb') as file:
+            _download(url, file)
+        result = subprocess.run(["dpkg", "-i", deb_file])
+        if result.returncode != 0:
+            cprint(f"dpkg exited with status {result.returncode} while installing {filename}.", color="flat_red")
 
 def unionfuse(fused_dir: str, source_dir: str, destination_dir: str):
     """
@@ -58,9 +75,9 @@ def unionfuse(fused_dir: str, source_dir: str, destination_dir: str):
         for directory in [source_dir, fused_dir, destination_dir]:
             os.makedirs(directory, exist_ok=True)
 
-        command = f"unionfs-fuse {destination_dir}=RW:\"{source_dir}\"=RW {fused_dir}"
-        
-        result = os.system(command)
+        command = ["unionfs-fuse", f"{destination_dir}=RW:{source_dir}=RW", fused_dir]
+
+        result = subprocess.run(command).returncode
         
         if result != 0:
             cprint(f"An error occurred while fusing the folders. Command exited with status: {result}", color="flat_red")
@@ -13,7 +13,7 @@ setup(
         'toml',
         'rarfile',
         'xmltodict',
-        'pydantic'
+        'msgspec'
     ],
     author='Furqanil Taqwa',
     author_email='furqanil.taqwa@gmail.com',